@@ -0,0 +1,110 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+# One result per input: the waveform, or the exception that item failed with
+InferBatchFn = Callable[[List[str], List[Any], List[str]], List[Union[np.ndarray, Exception]]]
+
+
+class BatchScheduler:
+    """Coalesces infer() calls that arrive within max_wait_ms into one infer_batch() call.
+
+    Each queued item carries its own Future and receives its slice of the batch result; an
+    item returned as an exception fails only its own Future. At most `concurrency` batches
+    run at once, on a dedicated thread pool.
+    """
+
+    def __init__(
+        self, infer_batch: InferBatchFn, max_batch: int, max_wait_ms: float, concurrency: int = 1
+    ) -> None:
+        self.infer_batch = infer_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.concurrency = max(1, concurrency)
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Set[asyncio.Future] = set()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="tts-infer")
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+        # Queued and in-flight callers (possibly threads blocked in infer()) must not outlive us
+        for fut in list(self._pending):
+            if not fut.done():
+                fut.set_exception(RuntimeError("batch scheduler stopped"))
+        self._pending.clear()
+
+    async def submit(self, text: str, ref_codes: Any, ref_text: str) -> np.ndarray:
+        assert self._queue is not None
+        if self._task is None:
+            raise RuntimeError("batch scheduler is not running")
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.add(fut)
+        fut.add_done_callback(self._pending.discard)
+        await self._queue.put((text, ref_codes, ref_text, fut))
+        return await fut
+
+    def infer(self, text: str, ref_codes: Any, ref_text: str) -> np.ndarray:
+        # Drop-in for NeuTTS.infer, callable from worker threads
+        assert self._loop is not None
+        return asyncio.run_coroutine_threadsafe(self.submit(text, ref_codes, ref_text), self._loop).result()
+
+    async def _run(self) -> None:
+        assert self._queue is not None and self._loop is not None
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[Tuple[str, Any, str, asyncio.Future]]) -> None:
+        assert self._sem is not None and self._loop is not None
+        texts, ref_codes, ref_texts, futures = zip(*batch)
+        async with self._sem:
+            try:
+                wavs = await self._loop.run_in_executor(
+                    self._pool, self.infer_batch, list(texts), list(ref_codes), list(ref_texts)
+                )
+                if len(wavs) != len(futures):
+                    raise RuntimeError(f"infer_batch returned {len(wavs)} results for {len(futures)} inputs")
+            except Exception as e:
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+
+        for fut, wav in zip(futures, wavs):
+            if fut.done():
+                continue
+            if isinstance(wav, Exception):
+                fut.set_exception(wav)
+            else:
+                fut.set_result(wav)
@@ -0,0 +1,14 @@
+"""Per-worker CPU thread budget.
+
+Import this before numpy/torch: OpenMP, MKL and OpenBLAS read their thread counts when the
+library is first loaded, so the env defaults below only take effect if they're set first.
+"""
+import os
+
+# Split the cores between uvicorn workers (WEB_CONCURRENCY) so they don't oversubscribe each
+# other; explicit env settings win.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+THREADS_PER_WORKER = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(_var, str(THREADS_PER_WORKER))
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Literal
 
-AudioFormat = Literal["mp3", "wav", "flac", "pcm"]
+AudioFormat = Literal["mp3", "opus", "wav", "flac", "ogg", "pcm"]
 
 class OpenAISpeechRequest(BaseModel):
     input: str = Field(..., description="Text input to synthesize.")
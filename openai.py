@@ -1,9 +1,17 @@
+# Must come first: sets OMP/MKL/OpenBLAS thread defaults before numpy/torch are loaded
+import cpu_threads  # noqa: F401
+
+import io
+import itertools
 import os
-import tempfile
-from pathlib import Path
+import time
+from typing import AsyncIterator, Iterator
 
+import anyio
+import numpy as np
 from fastapi import FastAPI, Body
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import Response, JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
 # Keep import if present in repo, but we won't require it for request parsing
 try:
@@ -11,25 +19,65 @@ try:
 except Exception:
     OpenAISpeechRequest = None  # type: ignore
 
+from batching import BatchScheduler
 from tts_service import NeuttsNanoGermanService
+from utils import create_wav_header, mp3_encoder, wav_to_int16, write_audio
 
 app = FastAPI(title="NeuTTS OpenAI-compatible API (Nano German)")
 
 tts = NeuttsNanoGermanService()
 
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "ogg": "audio/ogg",
+    "opus": "audio/opus",
+    "pcm": "audio/pcm",
+}
+
+# Formats that can be encoded incrementally and streamed to the client
+STREAM_FORMATS = {"mp3", "wav", "pcm"}
+
+# Total length is unknown while streaming; use the maximum RIFF size
+WAV_STREAM_DATA_SIZE = 0xFFFFFFFF - 36
+
+# Dynamic batching for the torch backbone. One model instance serves every request, so by
+# default only one batch runs at a time (the service serializes model access regardless).
+scheduler = BatchScheduler(
+    tts.infer_batch,
+    max_batch=tts.max_batch,
+    max_wait_ms=float(os.getenv("TTS_BATCH_WAIT_MS", "15")),
+    concurrency=int(os.getenv("TTS_CONCURRENCY", "1")),
+)
+
+@app.on_event("startup")
+async def _startup():
+    # Manifest scan, model load and warmup are blocking; keep them off the event loop
+    await run_in_threadpool(tts.startup)
+
 @app.on_event("startup")
-def _startup():
-    tts.startup()
+async def _start_scheduler():
+    scheduler.start()
+
+@app.on_event("shutdown")
+async def _stop_scheduler():
+    await scheduler.stop()
+
+def _infer_fn():
+    # Batching only pays off when infer_batch() really batches; otherwise a queue window and
+    # sequential batch members would only add latency
+    return scheduler.infer if tts.supports_batching else None
 
 @app.get("/health")
 def health():
     return {
         "status": "ok",
-        "model": os.getenv("NEUTTS_BACKBONE_REPO", "neuphonic/neutts-nano-german"),
+        "model": tts.backbone_repo,
         "voices": tts.list_voices(),
         "device": {
-            "backbone": os.getenv("NEUTTS_BACKBONE_DEVICE", "cpu"),
-            "codec": os.getenv("NEUTTS_CODEC_DEVICE", "cpu"),
+            "backbone": tts.backbone_device,
+            "codec": tts.codec_device,
         },
     }
 
@@ -48,50 +96,93 @@ def _parse_openai_tts_payload(payload: dict) -> tuple[str, str, str]:
     if not isinstance(fmt, str) or not fmt.strip():
         fmt = "mp3"
     fmt = fmt.strip().lower()
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported response_format '{fmt}'. Supported: {sorted(MEDIA_TYPES)}")
 
     return text, voice.strip(), fmt
 
+def _encoded_chunks(chunks: Iterator[np.ndarray], sr: int, fmt: str) -> Iterator[bytes]:
+    # Runs in the threadpool step that also pulls the next synthesized chunk. LAME keeps state
+    # across chunks and releases the GIL while encoding, so no process offload is needed.
+    enc = mp3_encoder(sr) if fmt == "mp3" else None
+    if fmt == "wav":
+        yield create_wav_header(sr, 1, 16, WAV_STREAM_DATA_SIZE)
+
+    for wav in chunks:
+        data = wav_to_int16(wav).tobytes()
+        if enc is not None:
+            data = bytes(enc.encode(data))
+        if data:
+            yield data
+
+    if enc is not None:
+        yield bytes(enc.flush())
+
+async def _encode_stream(
+    first: np.ndarray, chunks: Iterator[np.ndarray], sr: int, fmt: str
+) -> AsyncIterator[bytes]:
+    # Chunks are synthesized and encoded lazily; run both in the threadpool to keep the loop free
+    try:
+        async for data in iterate_in_threadpool(_encoded_chunks(itertools.chain([first], chunks), sr, fmt)):
+            yield data
+    finally:
+        # A client disconnect finalizes this generator on the event loop. Close the synthesis
+        # generator in a worker so its cleanup runs off the loop, even when cancelled.
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(close)
+
+def _encode_buffer(wav: np.ndarray, sr: int, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    write_audio(wav, sr, fmt, buf)
+    return buf.getvalue()
+
 @app.post("/v1/audio/speech")
-def openai_speech(payload: dict = Body(...)):
+async def openai_speech(payload: dict = Body(...)):
     try:
         text, voice, fmt = _parse_openai_tts_payload(payload)
     except ValueError as e:
         return JSONResponse(status_code=422, content={"detail": str(e)})
 
-    # Synthesize to wav @24k
-    wav, sr, meta = tts.synthesize_wav_24k(text, voice)
-
-    # Write to temp dir, read bytes, then return bytes (IMPORTANT: cannot return FileResponse
-    # from a TemporaryDirectory because the directory is deleted before FileResponse reads it)
-    with tempfile.TemporaryDirectory() as td:
-        out_path = Path(td) / f"speech.{fmt}"
-        try:
-            tts.write_audio(wav, sr, fmt, out_path)
-        except Exception as e:
-            return JSONResponse(status_code=500, content={"detail": f"Audio export failed: {e}"})
-
-        if not out_path.exists():
-            return JSONResponse(status_code=500, content={"detail": f"Output file was not created: {out_path.name}"})
-
-        data = out_path.read_bytes()
-
-    media_type = {
-        "mp3": "audio/mpeg",
-        "wav": "audio/wav",
-        "flac": "audio/flac",
-        "pcm": "audio/pcm",
-    }.get(fmt, "application/octet-stream")
-
-    return Response(
-        content=data,
-        media_type=media_type,
-        headers={
-            "x-tts-latency-s": str(meta.get("latency_s", "")),
+    media_type = MEDIA_TYPES[fmt]
+
+    if fmt in STREAM_FORMATS:
+        # Synthesize sentence by sentence; the first chunk is produced before responding so
+        # synthesis errors still surface as a proper status code
+        # May hit the cold path (reference read/encode for a voice missing from the cache)
+        chunks, sr, meta = await run_in_threadpool(tts.synthesize_stream, text, voice, _infer_fn())
+        t0 = time.time()
+        first = await run_in_threadpool(next, chunks)
+        headers = {
+            "x-tts-latency-s": f"{time.time() - t0:.4f}",
             "x-tts-voice-id": str(meta.get("voice_id", "")),
-        },
-    )
+            "x-tts-cache": str(meta.get("cache", "")),
+        }
+        return StreamingResponse(
+            _encode_stream(first, chunks, sr, fmt),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    # Synthesize to wav @24k
+    wav, sr, meta = await run_in_threadpool(tts.synthesize_wav_24k, text, voice, _infer_fn())
+    headers = {
+        "x-tts-latency-s": f"{meta['latency_s']:.4f}",
+        "x-tts-voice-id": str(meta.get("voice_id", "")),
+        "x-tts-cache": str(meta.get("cache", "")),
+    }
+
+    # Container formats (flac/ogg/opus) need the whole signal; libsndfile releases the GIL, so
+    # encoding in the threadpool keeps it off the event loop
+    try:
+        data = await run_in_threadpool(_encode_buffer, wav, sr, fmt)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": f"Audio export failed: {e}"})
+
+    return Response(content=data, media_type=media_type, headers=headers)
 
 @app.post("/synthesize")
-def synthesize(payload: dict = Body(...)):
+async def synthesize(payload: dict = Body(...)):
     # convenience alias
-    return openai_speech(payload)
+    return await openai_speech(payload)
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from batching import BatchScheduler
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_coalesces_requests_within_window_and_slices_results():
+    calls = []
+
+    def infer_batch(texts, ref_codes, ref_texts):
+        calls.append(list(texts))
+        return [np.full(3, float(len(t))) for t in texts]
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=4, max_wait_ms=50)
+        scheduler.start()
+        try:
+            return await asyncio.gather(*(scheduler.submit("x" * n, None, "ref") for n in (1, 2, 3)))
+        finally:
+            await scheduler.stop()
+
+    wavs = _run(main())
+
+    assert calls == [["x", "xx", "xxx"]]
+    assert [w[0] for w in wavs] == [1.0, 2.0, 3.0]
+
+
+def test_splits_at_max_batch():
+    calls = []
+
+    def infer_batch(texts, ref_codes, ref_texts):
+        calls.append(len(texts))
+        return [np.zeros(1) for _ in texts]
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=2, max_wait_ms=50)
+        scheduler.start()
+        try:
+            await asyncio.gather(*(scheduler.submit(str(i), None, "ref") for i in range(5)))
+        finally:
+            await scheduler.stop()
+
+    _run(main())
+
+    assert sorted(calls) == [1, 2, 2]
+
+
+def test_error_fans_out_to_every_item_in_batch():
+    def infer_batch(texts, ref_codes, ref_texts):
+        raise ValueError("boom")
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=4, max_wait_ms=50)
+        scheduler.start()
+        try:
+            return await asyncio.gather(
+                *(scheduler.submit(str(i), None, "ref") for i in range(3)), return_exceptions=True
+            )
+        finally:
+            await scheduler.stop()
+
+    results = _run(main())
+
+    assert len(results) == 3
+    assert all(isinstance(r, ValueError) and str(r) == "boom" for r in results)
+
+
+def test_result_count_mismatch_fails_the_batch():
+    def infer_batch(texts, ref_codes, ref_texts):
+        return [np.zeros(1)]
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=4, max_wait_ms=50)
+        scheduler.start()
+        try:
+            return await asyncio.gather(
+                *(scheduler.submit(str(i), None, "ref") for i in range(2)), return_exceptions=True
+            )
+        finally:
+            await scheduler.stop()
+
+    results = _run(main())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_infer_is_callable_from_worker_threads():
+    def infer_batch(texts, ref_codes, ref_texts):
+        return [np.array([float(c)]) for c in ref_codes]
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=4, max_wait_ms=10)
+        scheduler.start()
+        try:
+            return await asyncio.gather(
+                asyncio.to_thread(scheduler.infer, "a", 1, "ref"),
+                asyncio.to_thread(scheduler.infer, "b", 2, "ref"),
+            )
+        finally:
+            await scheduler.stop()
+
+    wavs = _run(main())
+
+    assert [w[0] for w in wavs] == pytest.approx([1.0, 2.0])
+
+
+def test_item_exception_fails_only_its_own_request():
+    def infer_batch(texts, ref_codes, ref_texts):
+        return [ValueError("no speech tokens") if t == "bad" else np.ones(1) for t in texts]
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=4, max_wait_ms=50)
+        scheduler.start()
+        try:
+            futures = [asyncio.ensure_future(scheduler.submit(t, None, "ref")) for t in ("ok", "bad", "ok")]
+            await asyncio.wait(futures)
+            return futures
+        finally:
+            await scheduler.stop()
+
+    ok1, bad, ok2 = _run(main())
+
+    assert isinstance(bad.exception(), ValueError)
+    assert ok1.result()[0] == 1.0 and ok2.result()[0] == 1.0
+
+
+def test_stop_fails_queued_and_in_flight_requests():
+    release = threading.Event()
+
+    def infer_batch(texts, ref_codes, ref_texts):
+        release.wait(5)
+        return [np.zeros(1) for _ in texts]
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=1, max_wait_ms=0)
+        scheduler.start()
+        callers = [asyncio.create_task(asyncio.to_thread(scheduler.infer, str(i), None, "ref")) for i in range(3)]
+        await asyncio.sleep(0.1)
+        try:
+            await scheduler.stop()
+            return await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 2)
+        finally:
+            release.set()
+
+    results = _run(main())
+
+    assert len(results) == 3
+    assert all(isinstance(r, RuntimeError) and str(r) == "batch scheduler stopped" for r in results)
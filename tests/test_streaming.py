@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("neutts")
+
+import openai  # noqa: E402
+from batching import BatchScheduler  # noqa: E402
+from tts_service import MIN_CHUNK_CHARS, NeuttsNanoGermanService, split_sentences  # noqa: E402
+
+
+def test_split_keeps_abbreviations_and_decimals_together():
+    assert split_sentences("z.B. 3.5 Euro. Ok") == ["z.B. 3.5 Euro. Ok"]
+
+
+def test_split_separates_full_sentences():
+    first = "Das ist der erste Satz, und er ist lang genug."
+    second = "Dies ist der zweite Satz, ebenfalls lang genug."
+    assert split_sentences(f"{first} {second}") == [first, second]
+
+
+def test_split_folds_short_tail_into_previous_chunk():
+    first = "Das ist der erste Satz, und er ist lang genug."
+    chunks = split_sentences(f"{first} Ok.")
+    assert chunks == [f"{first} Ok."]
+    assert all(len(c) >= MIN_CHUNK_CHARS for c in chunks)
+
+
+def test_abandoned_stream_does_not_block_event_loop():
+    release = threading.Event()
+    closed_on = []
+
+    def infer_batch(texts, ref_codes, ref_texts):
+        # The look-ahead sentence is still synthesizing when the client goes away
+        if texts[0] != "first":
+            release.wait(5)
+        return [np.ones(100, dtype=np.float32) for _ in texts]
+
+    def chunks_of(gen):
+        try:
+            yield from gen
+        finally:
+            closed_on.append(threading.current_thread())
+
+    async def main():
+        scheduler = BatchScheduler(infer_batch, max_batch=1, max_wait_ms=0)
+        scheduler.start()
+        try:
+            synth = NeuttsNanoGermanService._synth_chunks(["first", "second"], None, "ref", scheduler.infer)
+            chunks = chunks_of(synth)
+            first = await asyncio.to_thread(next, chunks)
+            stream = openai._encode_stream(first, chunks, 24000, "pcm")
+            await stream.__anext__()
+            await asyncio.wait_for(stream.aclose(), 2)
+        finally:
+            release.set()
+            await scheduler.stop()
+
+    asyncio.run(main())
+
+    assert len(closed_on) == 1
+    assert closed_on[0] is not threading.main_thread()
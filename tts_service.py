@@ -1,15 +1,65 @@
-import json
+import hashlib
+import logging
 import os
+import pickle
+import re
+import threading
 import time
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+# Sets OMP/MKL/OpenBLAS thread defaults; must precede numpy/torch
+from cpu_threads import THREADS_PER_WORKER
 
 import numpy as np
-import soundfile as sf
+import orjson
+import torch
+from cachetools import LRUCache
 from fastapi import HTTPException
 from neutts import NeuTTS
 
+logger = logging.getLogger(__name__)
+
+# Streaming synthesis works sentence by sentence
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+# 2 ms @ 24kHz fade at chunk edges so stitched sentences don't click
+FADE_SAMPLES = 48
+
+
+# Fragments shorter than this are merged into their neighbour: abbreviations ("z.B.", "Nr. 3")
+# and decimals would otherwise each become a separate infer() call padded to min_new_tokens.
+MIN_CHUNK_CHARS = 40
+
+
+def split_sentences(text: str) -> List[str]:
+    chunks: List[str] = []
+    for part in SENTENCE_SPLIT.split(text.strip()):
+        part = part.strip()
+        if not part:
+            continue
+        if chunks and len(chunks[-1]) < MIN_CHUNK_CHARS:
+            chunks[-1] = f"{chunks[-1]} {part}"
+        else:
+            chunks.append(part)
+
+    # A short trailing fragment belongs to the previous sentence
+    if len(chunks) > 1 and len(chunks[-1]) < MIN_CHUNK_CHARS:
+        tail = chunks.pop()
+        chunks[-1] = f"{chunks[-1]} {tail}"
+    return chunks or [text]
+
+
+def _fade_edges(audio: np.ndarray) -> np.ndarray:
+    n = min(FADE_SAMPLES, len(audio) // 2)
+    if n:
+        ramp = np.linspace(0.0, 1.0, n, dtype=audio.dtype)
+        audio[:n] *= ramp
+        audio[-n:] *= ramp[::-1]
+    return audio
+
 
 @dataclass(frozen=True)
 class VoiceAsset:
@@ -21,40 +71,67 @@ class VoiceAsset:
 class VoiceRegistry:
     """Loads voices from voices.json inside VOICE_SAMPLES_DIR.
 
+    "codes" is optional and may point to a torch (*.pt) or numpy (*.npy) file.
+
     voices.json format:
       {
         "default": {"wav": "default.wav", "txt": "default.txt", "codes": "default.pt"},
         "greta":   {"wav": "greta.wav",   "txt": "greta.txt",   "codes": "greta.pt"}
       }
+
+    Entries without "codes" pick up a <wav name>.pt written next to the wav by a previous run.
     """
 
     def __init__(self, voice_dir: Path, manifest_name: str = "voices.json") -> None:
         self.voice_dir = voice_dir
+        self.manifest_name = manifest_name
         self.manifest_path = voice_dir / manifest_name
         self.voices: Dict[str, VoiceAsset] = {}
 
     def load(self) -> None:
-        if not self.manifest_path.exists():
+        # One directory listing answers every existence check below
+        try:
+            with os.scandir(self.voice_dir) as it:
+                names = {e.name for e in it if e.is_file()}
+        except FileNotFoundError as e:
+            raise RuntimeError(f"voices manifest not found: {self.manifest_path}") from e
+
+        if self.manifest_name not in names:
             raise RuntimeError(f"voices manifest not found: {self.manifest_path}")
 
-        data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
-        voices: Dict[str, VoiceAsset] = {}
+        self.voices = self._load_from_manifest(names)
 
-        for voice_id, entry in data.items():
-            wav = self.voice_dir / entry["wav"]
-            txt = self.voice_dir / entry["txt"]
-            codes = self.voice_dir / entry["codes"] if "codes" in entry else None
+    def _exists(self, names: Set[str], name: str) -> bool:
+        if name in names:
+            return True
+        # Entries pointing into subdirectories aren't in the top-level listing
+        return ("/" in name or os.sep in name) and (self.voice_dir / name).is_file()
 
-            if not wav.exists():
-                raise RuntimeError(f"missing wav for voice '{voice_id}': {wav}")
-            if not txt.exists():
-                raise RuntimeError(f"missing txt for voice '{voice_id}': {txt}")
-            if codes is not None and not codes.exists():
-                raise RuntimeError(f"missing codes for voice '{voice_id}': {codes}")
+    def _load_from_manifest(self, names: Set[str]) -> Dict[str, VoiceAsset]:
+        data = orjson.loads(self.manifest_path.read_bytes())
+        voices: Dict[str, VoiceAsset] = {}
 
-            voices[voice_id] = VoiceAsset(wav_path=wav, txt_path=txt, codes_path=codes)
+        for voice_id, entry in data.items():
+            if not self._exists(names, entry["wav"]):
+                raise RuntimeError(f"missing wav for voice '{voice_id}': {self.voice_dir / entry['wav']}")
+            if not self._exists(names, entry["txt"]):
+                raise RuntimeError(f"missing txt for voice '{voice_id}': {self.voice_dir / entry['txt']}")
+            if "codes" in entry and not self._exists(names, entry["codes"]):
+                raise RuntimeError(f"missing codes for voice '{voice_id}': {self.voice_dir / entry['codes']}")
+
+            codes = entry.get("codes")
+            if codes is None:
+                # Codes persisted next to the wav by an earlier run
+                persisted = str(Path(entry["wav"]).with_suffix(".pt"))
+                codes = persisted if self._exists(names, persisted) else None
+
+            voices[voice_id] = VoiceAsset(
+                wav_path=self.voice_dir / entry["wav"],
+                txt_path=self.voice_dir / entry["txt"],
+                codes_path=self.voice_dir / codes if codes is not None else None,
+            )
 
-        self.voices = voices
+        return voices
 
     def resolve(self, voice_id: str) -> VoiceAsset:
         if voice_id not in self.voices:
@@ -67,12 +144,18 @@ class VoiceRegistry:
 
 class NeuttsNanoGermanService:
     def __init__(self) -> None:
+        # Devices: "cpu" or "cuda" (defaults to cuda when a GPU is visible)
+        default_device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backbone_device = os.getenv("NEUTTS_BACKBONE_DEVICE", default_device)
+        self.codec_device = os.getenv("NEUTTS_CODEC_DEVICE", default_device)
+
         # ---------------------------------------------------------------------
         # Backbone selection (FP32 vs GGUF quantized variants)
         #
         # Priority:
         #   1) NEUTTS_BACKBONE_REPO (explicit)
         #   2) NEUTTS_MODEL_BASE + NEUTTS_BACKBONE_VARIANT
+        #      (variant defaults to q8 on CPU, fp32 on GPU)
         #
         # Examples:
         #   FP32: NEUTTS_MODEL_BASE=neutts-nano-german, NEUTTS_BACKBONE_VARIANT=fp32
@@ -86,7 +169,8 @@ class NeuttsNanoGermanService:
         # ---------------------------------------------------------------------
         explicit_repo = os.getenv("NEUTTS_BACKBONE_REPO")
         model_base = os.getenv("NEUTTS_MODEL_BASE", "neutts-nano-german").strip()
-        variant = os.getenv("NEUTTS_BACKBONE_VARIANT", "fp32").strip().lower()
+        default_variant = "q8" if self.backbone_device == "cpu" else "fp32"
+        variant = os.getenv("NEUTTS_BACKBONE_VARIANT", default_variant).strip().lower()
 
         if explicit_repo and explicit_repo.strip():
             self.backbone_repo = explicit_repo.strip()
@@ -100,18 +184,53 @@ class NeuttsNanoGermanService:
 
         self.codec_repo = os.getenv("NEUTTS_CODEC_REPO", "neuphonic/neucodec")
 
-        # Devices: "cpu" or "cuda"
-        self.backbone_device = os.getenv("NEUTTS_BACKBONE_DEVICE", "cpu")
-        self.codec_device = os.getenv("NEUTTS_CODEC_DEVICE", "cpu")
+        # Backbone weight dtype on GPU: fp16 | bf16 | fp32
+        self.backbone_dtype = os.getenv("NEUTTS_BACKBONE_DTYPE", "fp16").strip().lower()
+
+        # torch.compile + CUDA graphs for the decode step (GPU torch backbone only)
+        self.compile_backbone = os.getenv("NEUTTS_COMPILE", "1") == "1"
+
+        # Dynamic int8 Linear layers for a torch (non-GGUF) backbone running on CPU
+        self.cpu_int8 = os.getenv("NEUTTS_CPU_INT8", "1") == "1"
+
+        # Save codes encoded from a wav as <wav name>.pt (disable for read-only voice dirs)
+        self.persist_ref_codes = os.getenv("NEUTTS_PERSIST_REF_CODES", "1") == "1"
+
+        # Run one dummy synthesis at the end of startup()
+        self.warmup = os.getenv("NEUTTS_WARMUP", "1") == "1"
+
+        # Largest batch the scheduler forms; a compiled backbone is warmed up at every size up to it
+        self.max_batch = max(1, int(os.getenv("TTS_MAX_BATCH", "4")))
 
         voice_dir = Path(os.getenv("VOICE_SAMPLES_DIR", "/voices"))
         self.registry = VoiceRegistry(voice_dir=voice_dir)
         self.tts: Optional[NeuTTS] = None
 
+        # voice_id -> (ref_codes, ref_text), filled once at startup
+        self._ref_cache: Dict[str, Tuple[Any, str]] = {}
+        self._ref_lock = threading.Lock()
+
+        # Single model instance: llama.cpp and HF generate() (shared KV cache) aren't reentrant
+        self._model_lock = threading.Lock()
+
+        # (voice_id, text) -> synthesized wav, LRU bounded by total bytes (TTS_CACHE_MB=0 disables)
+        cache_bytes = int(os.getenv("TTS_CACHE_MB", "128")) * 1024 * 1024
+        self._wav_cache: Optional[LRUCache] = (
+            LRUCache(maxsize=cache_bytes, getsizeof=lambda wav: wav.nbytes) if cache_bytes > 0 else None
+        )
+        self._wav_cache_lock = threading.Lock()
+
     def startup(self) -> None:
         # Load voices first (fail fast)
         self.registry.load()
 
+        # One intra-op pool per worker, sized to its share of the cores
+        torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", str(THREADS_PER_WORKER))))
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:  # pragma: no cover - already set once parallel work has started
+            pass
+
         # If GGUF backbone is selected, we need llama-cpp-python installed
         if "gguf" in self.backbone_repo.lower():
             try:
@@ -130,56 +249,331 @@ class NeuttsNanoGermanService:
             codec_device=self.codec_device,
         )
 
+        # Half-precision transformer decode on GPU. The codec stays fp32: its encoder is fed
+        # float32 waveforms and its output goes straight to the watermarker.
+        half_dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(self.backbone_dtype)
+        if (
+            half_dtype is not None
+            and self.backbone_device.startswith("cuda")
+            and not getattr(self.tts, "_is_quantized_model", False)
+        ):
+            self.tts.backbone.to(dtype=half_dtype).eval()
+
+        if (
+            self.cpu_int8
+            and self.backbone_device == "cpu"
+            and not getattr(self.tts, "_is_quantized_model", False)
+        ):
+            self._quantize_backbone()
+
+        # Keep reference codes + texts resident so requests never touch the disk
+        self._ref_cache = {
+            voice_id: self._load_reference(asset)
+            for voice_id, asset in self.registry.voices.items()
+        }
+
+        if self.compile_backbone and self.backbone_device.startswith("cuda"):
+            # Runs its own warmup synthesis to validate the compiled graph
+            self._compile_backbone()
+        elif self.warmup:
+            self._warmup()
+
+    def list_voices(self) -> List[str]:
+        return sorted(self.registry.voices.keys())
+
+    def _quantize_backbone(self) -> None:
+        assert self.tts is not None
+
+        # oneDNN picks the VNNI int8 GEMM kernels where the CPU has them
+        if "onednn" in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = "onednn"
+        self.tts.backbone = torch.ao.quantization.quantize_dynamic(
+            self.tts.backbone, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    def _compile_backbone(self) -> None:
+        assert self.tts is not None
+        if getattr(self.tts, "_is_quantized_model", False):
+            return
+
+        # A static KV cache sized to max_length gives every decode step the same shapes, so
+        # "reduce-overhead" can capture it once as a CUDA graph and replay it per token instead
+        # of re-launching each kernel from Python. transformers reuses one StaticCache across
+        # generate() calls; _model_lock keeps calls from sharing it.
+        backbone = self.tts.backbone
+        eager_forward = backbone.forward
+        eager_cache = backbone.generation_config.cache_implementation
+        try:
+            backbone.generation_config.cache_implementation = "static"
+            backbone.forward = torch.compile(eager_forward, mode="reduce-overhead", fullgraph=True)
+        except Exception as e:  # pragma: no cover
+            logger.warning("torch.compile unavailable, running eager backbone: %s", e)
+            backbone.forward = eager_forward
+            backbone.generation_config.cache_implementation = eager_cache
+            return
+
+        # Compilation is lazy and happens once per batch size: graph breaks and inductor errors
+        # only surface on the first forward at that size, so real syntheses at every batch size
+        # the scheduler can form decide whether the compiled backbone is kept
+        if not self._warmup(self.max_batch):
+            logger.warning("compiled backbone failed warmup, reverting to eager backbone")
+            backbone.forward = eager_forward
+            backbone.generation_config.cache_implementation = eager_cache
+            if self.warmup:
+                self._warmup()
+
+    def _warmup(self, max_batch: int = 1) -> bool:
+        assert self.tts is not None
+
+        # One throwaway synthesis pays allocator, autotune and torch.compile costs at boot instead
+        # of on the first request, and runs the backbone + codec decode end to end.
+        voice_id = "default" if "default" in self._ref_cache else next(iter(self._ref_cache), None)
+        if voice_id is None:
+            return False
+        ref_codes, ref_text = self._ref_cache[voice_id]
+        t0 = time.time()
+        try:
+            self._infer("Guten Tag.", ref_codes, ref_text)
+            for n in range(2, max_batch + 1):
+                results = self.infer_batch(["Guten Tag."] * n, [ref_codes] * n, [ref_text] * n)
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+        except Exception:
+            logger.exception("warmup synthesis with voice '%s' failed", voice_id)
+            return False
+        logger.info("warmup synthesis with voice '%s' took %.2fs", voice_id, time.time() - t0)
+        return True
+
+    def _load_reference(self, asset: VoiceAsset) -> Tuple[Any, str]:
+        ref_text = asset.txt_path.read_text(encoding="utf-8").strip()
+        return self._encode_reference(asset), ref_text
+
+    def _reference(self, voice_id: str) -> Tuple[Any, str]:
+        asset = self.registry.resolve(voice_id)
+
+        cached = self._ref_cache.get(voice_id)
+        if cached is not None:
+            return cached
+
+        # Voice registered after startup: encode once, then serve from cache
+        with self._ref_lock:
+            cached = self._ref_cache.get(voice_id)
+            if cached is None:
+                cached = self._load_reference(asset)
+                self._ref_cache[voice_id] = cached
+        return cached
+
     def _encode_reference(self, asset: VoiceAsset):
         assert self.tts is not None
 
-        # Prefer cached codes if provided (your *.pt files)
+        # Prefer cached codes if provided (your *.pt / *.npy files), memory-mapped where possible
         if asset.codes_path is not None:
-            import torch
-            return torch.load(asset.codes_path, map_location="cpu")
+            if asset.codes_path.suffix == ".npy":
+                return np.load(str(asset.codes_path), mmap_mode="r")
+            try:
+                return torch.load(asset.codes_path, map_location="cpu", mmap=True, weights_only=True)
+            except (OSError, RuntimeError, TypeError, pickle.UnpicklingError):
+                # Legacy (non-zip) checkpoints, pickled non-tensors or filesystems without mmap
+                return torch.load(asset.codes_path, map_location="cpu")
+
+        # Otherwise compute on the fly from wav, and keep the result for the next startup
+        codes = self.tts.encode_reference(str(asset.wav_path))
+        if self.persist_ref_codes:
+            self._persist_reference(asset, codes)
+        return codes
+
+    def _persist_reference(self, asset: VoiceAsset, codes: Any) -> None:
+        codes_path = asset.wav_path.with_suffix(".pt")
+        tmp_path = codes_path.with_suffix(".pt.tmp")
+        try:
+            torch.save(codes.cpu() if isinstance(codes, torch.Tensor) else codes, tmp_path)
+            tmp_path.replace(codes_path)
+        except (OSError, RuntimeError) as e:
+            # torch's zip writer reports unwritable/missing directories as RuntimeError
+            logger.warning("could not persist reference codes to %s: %s", codes_path, e)
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return
 
-        # Otherwise compute on the fly from wav
-        return self.tts.encode_reference(str(asset.wav_path))
+        persisted = replace(asset, codes_path=codes_path)
+        for voice_id, registered in list(self.registry.voices.items()):
+            if registered == asset:
+                self.registry.voices[voice_id] = persisted
 
-    def synthesize_wav_24k(self, text: str, voice_id: str) -> Tuple[np.ndarray, int, Dict]:
+    @property
+    def supports_batching(self) -> bool:
+        # GGUF backbones (llama.cpp) have no batched API here
+        return self.tts is not None and not getattr(self.tts, "_is_quantized_model", True)
+
+    def _infer(self, text: str, ref_codes: Any, ref_text: str) -> np.ndarray:
+        assert self.tts is not None
+        with self._model_lock:
+            return self.tts.infer(text, ref_codes, ref_text)
+
+    def infer_batch(
+        self, texts: List[str], ref_codes: List[Any], ref_texts: List[str]
+    ) -> List[Union[np.ndarray, Exception]]:
+        """Run several infer() calls as one padded generate() on the torch backbone.
+
+        Returns one waveform per input, or the exception that input failed with, so one bad
+        item doesn't fail the rest of the batch. Backbones without batching support fall back
+        to one call per item.
+        """
         assert self.tts is not None
 
-        asset = self.registry.resolve(voice_id)
-        ref_text = asset.txt_path.read_text(encoding="utf-8").strip()
-        ref_codes = self._encode_reference(asset)
+        if len(texts) == 1 or not self.supports_batching:
+            results: List[Union[np.ndarray, Exception]] = []
+            for t, c, r in zip(texts, ref_codes, ref_texts):
+                try:
+                    results.append(self._infer(t, c, r))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        with self._model_lock:
+            return self._infer_batch_torch(texts, ref_codes, ref_texts)
+
+    def _infer_batch_torch(
+        self, texts: List[str], ref_codes: List[Any], ref_texts: List[str]
+    ) -> List[Union[np.ndarray, Exception]]:
+        # Batched copy of NeuTTS.infer() -> _infer_torch() -> _decode() + watermark, built on the
+        # same private helpers. Keep prompt building and generate() kwargs in sync with
+        # NeuTTS._infer_torch when upgrading neutts.
+        assert self.tts is not None
 
-        t0 = time.time()
-        wav = self.tts.infer(text, ref_codes, ref_text)  # 24kHz waveform
-        latency_s = time.time() - t0
+        tokenizer = self.tts.tokenizer
+        prompts = [self.tts._apply_chat_template(c, r, t) for t, c, r in zip(texts, ref_codes, ref_texts)]
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+        # Left-pad so every row continues generating right after its own prompt
+        width = max(len(p) for p in prompts)
+        input_ids = torch.full((len(prompts), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(prompts), width), dtype=torch.long)
+        for i, prompt in enumerate(prompts):
+            input_ids[i, width - len(prompt):] = torch.tensor(prompt, dtype=torch.long)
+            attention_mask[i, width - len(prompt):] = 1
+
+        device = self.tts.backbone.device
+        speech_end_id = tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_END|>")
+        with torch.no_grad():
+            output_tokens = self.tts.backbone.generate(
+                input_ids.to(device),
+                attention_mask=attention_mask.to(device),
+                max_length=self.tts.max_context,
+                eos_token_id=speech_end_id,
+                pad_token_id=pad_id,
+                do_sample=True,
+                temperature=1.0,
+                top_k=50,
+                use_cache=True,
+                min_new_tokens=50,
+            )
 
-        meta = {
+        # Decode rows independently: _decode() raises for a row without speech tokens, and that
+        # must only fail its own request
+        wavs: List[Union[np.ndarray, Exception]] = []
+        for row in output_tokens[:, width:].cpu().numpy().tolist():
+            try:
+                output_str = tokenizer.decode(row, add_special_tokens=False)
+                wav = self.tts._decode(output_str)
+                wavs.append(self.tts.watermarker.apply_watermark(wav, sample_rate=24_000))
+            except Exception as e:
+                wavs.append(e)
+        return wavs
+
+    def _meta(self, voice_id: str, **extra: Any) -> Dict:
+        return {
             "voice_id": voice_id,
-            "latency_s": latency_s,
+            **extra,
             "sample_rate": 24000,
             "backbone_repo": self.backbone_repo,
             "codec_repo": self.codec_repo,
             "backbone_device": self.backbone_device,
             "codec_device": self.codec_device,
         }
-        return wav, 24000, meta
 
-    def write_audio(self, wav: np.ndarray, sr: int, fmt: str, out_path: Path) -> None:
-        # Write WAV first then optionally convert using ffmpeg for mp3/flac/opus/aac.
-        tmp_wav = out_path.with_suffix(".wav")
-        sf.write(str(tmp_wav), wav, sr)
+    @staticmethod
+    def _cache_key(voice_id: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{voice_id}|{text}".encode("utf-8"), digest_size=16).digest()
 
-        if fmt == "wav":
-            tmp_wav.replace(out_path)
-            return
+    def _cache_get(self, key: bytes) -> Optional[np.ndarray]:
+        if self._wav_cache is None:
+            return None
+        with self._wav_cache_lock:
+            return self._wav_cache.get(key)
 
-        if fmt == "pcm":
-            # raw little-endian float32 PCM
-            wav_f32 = wav.astype(np.float32, copy=False)
-            out_path.write_bytes(wav_f32.tobytes())
-            tmp_wav.unlink(missing_ok=True)
+    def _cache_put(self, key: bytes, wav: np.ndarray) -> None:
+        if self._wav_cache is None:
             return
+        with self._wav_cache_lock:
+            try:
+                self._wav_cache[key] = wav
+            except ValueError:
+                pass  # larger than the whole cache
+
+    def synthesize_wav_24k(
+        self, text: str, voice_id: str, infer: Optional[Callable[..., np.ndarray]] = None
+    ) -> Tuple[np.ndarray, int, Dict]:
+        assert self.tts is not None
+
+        infer = infer or self._infer
+        ref_codes, ref_text = self._reference(voice_id)
+
+        key = self._cache_key(voice_id, text)
+        wav = self._cache_get(key)
+        if wav is not None:
+            return wav, 24000, self._meta(voice_id, latency_s=0.0, cache="hit")
+
+        t0 = time.time()
+        wav = infer(text, ref_codes, ref_text)  # 24kHz waveform
+        latency_s = time.time() - t0
+
+        self._cache_put(key, np.array(wav, dtype=np.float32))
+        return wav, 24000, self._meta(voice_id, latency_s=latency_s, cache="miss")
+
+    def synthesize_stream(
+        self, text: str, voice_id: str, infer: Optional[Callable[..., np.ndarray]] = None
+    ) -> Tuple[Iterator[np.ndarray], int, Dict]:
+        assert self.tts is not None
 
-        import subprocess
-        cmd = ["ffmpeg", "-y", "-i", str(tmp_wav), str(out_path)]
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        tmp_wav.unlink(missing_ok=True)
+        infer = infer or self._infer
+
+        # Resolve eagerly so unknown voices fail before any audio is streamed
+        ref_codes, ref_text = self._reference(voice_id)
+
+        key = self._cache_key(voice_id, text)
+        wav = self._cache_get(key)
+        if wav is not None:
+            return iter([wav]), 24000, self._meta(voice_id, cache="hit")
+
+        chunks = self._synth_chunks(split_sentences(text), ref_codes, ref_text, infer)
+        return self._cache_when_done(key, chunks), 24000, self._meta(voice_id, cache="miss")
+
+    def _cache_when_done(self, key: bytes, chunks: Iterator[np.ndarray]) -> Iterator[np.ndarray]:
+        # Only a fully streamed response is cached; an aborted stream leaves no entry
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self._cache_put(key, np.concatenate(parts))
+
+    @staticmethod
+    def _synth_chunks(
+        chunks: List[str], ref_codes: Any, ref_text: str, infer: Callable[..., np.ndarray]
+    ) -> Iterator[np.ndarray]:
+        # Synthesize sentence N+1 while the caller encodes/streams sentence N
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            ahead = pool.submit(infer, chunks[0], ref_codes, ref_text)
+            for i in range(len(chunks)):
+                audio = np.array(ahead.result(), dtype=np.float32)
+                if i + 1 < len(chunks):
+                    ahead = pool.submit(infer, chunks[i + 1], ref_codes, ref_text)
+                yield _fade_edges(audio)
+        finally:
+            # Never wait for the look-ahead: an abandoned stream may be closed from the event
+            # loop, and BatchScheduler.infer needs that loop to finish
+            pool.shutdown(wait=False, cancel_futures=True)
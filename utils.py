@@ -1,19 +1,77 @@
 import struct
+from pathlib import Path
+from typing import BinaryIO, Union
+
+import lameenc
+import numpy as np
+import soundfile as sf
+
+# response_format -> libsndfile (container, codec subtype; None = container default)
+SOUNDFILE_FORMATS = {
+    "flac": ("FLAC", None),
+    "ogg": ("OGG", "VORBIS"),
+    "opus": ("OGG", "OPUS"),
+}
+
+
+def wav_to_int16(wav: np.ndarray) -> np.ndarray:
+    # float [-1, 1] -> C-contiguous little-endian int16 (scale + clip in place, one cast)
+    scaled = np.multiply(wav, 32767.0, dtype=np.float32)
+    np.clip(scaled, -32768, 32767, out=scaled)
+    return scaled.astype('<i2')
+
+
+def mp3_encoder(sample_rate: int, num_channels: int = 1) -> lameenc.Encoder:
+    enc = lameenc.Encoder()
+    enc.set_bit_rate(128)
+    enc.set_in_sample_rate(sample_rate)
+    enc.set_channels(num_channels)
+    enc.set_quality(5)
+    return enc
+
+
+# RIFF/WAVE header for PCM: RIFF chunk, 16-byte fmt chunk, data chunk header (44 bytes)
+_WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
 
 def create_wav_header(sample_rate: int, num_channels: int, bits_per_sample: int, data_size: int) -> bytes:
-    header = b'RIFF'
-    header += struct.pack('<I', 36 + data_size)
-    header += b'WAVE'
-    header += b'fmt '
-    header += struct.pack('<I', 16)
-    header += struct.pack('<H', 1)
-    header += struct.pack('<H', num_channels)
-    header += struct.pack('<I', sample_rate)
     byte_rate = sample_rate * num_channels * bits_per_sample // 8
     block_align = num_channels * bits_per_sample // 8
-    header += struct.pack('<I', byte_rate)
-    header += struct.pack('<H', block_align)
-    header += struct.pack('<H', bits_per_sample)
-    header += b'data'
-    header += struct.pack('<I', data_size)
-    return header
+    return _WAV_HEADER.pack(
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, num_channels, sample_rate, byte_rate, block_align, bits_per_sample,
+        b'data', data_size,
+    )
+
+
+def _write_bytes(out: Union[Path, BinaryIO], data: bytes) -> None:
+    if isinstance(out, Path):
+        out.write_bytes(data)
+    else:
+        out.write(data)
+
+
+def write_audio(wav: np.ndarray, sr: int, fmt: str, out: Union[Path, BinaryIO]) -> None:
+    # Encode in-process from one int16 buffer: raw/WAV directly, LAME for mp3,
+    # libsndfile for flac/ogg. `out` is a file path or any writable binary stream.
+    pcm16 = wav_to_int16(wav)
+
+    if fmt == "pcm":
+        # raw little-endian 16-bit PCM (OpenAI "pcm")
+        _write_bytes(out, pcm16.tobytes())
+        return
+
+    if fmt == "wav":
+        _write_bytes(out, create_wav_header(sr, 1, 16, pcm16.nbytes) + pcm16.tobytes())
+        return
+
+    if fmt == "mp3":
+        enc = mp3_encoder(sr)
+        _write_bytes(out, enc.encode(pcm16.tobytes()) + enc.flush())
+        return
+
+    if fmt not in SOUNDFILE_FORMATS:
+        raise ValueError(f"Unsupported response_format '{fmt}'")
+    sf_format, sf_subtype = SOUNDFILE_FORMATS[fmt]
+    sf.write(str(out) if isinstance(out, Path) else out, pcm16, sr, format=sf_format, subtype=sf_subtype)
+